@@ -154,26 +154,31 @@ def main(args):
     amptklib.log.info("Loading FASTQ Records")
     #convert to FASTA for mapping
     orig_fasta = os.path.join(tmp, base+'.orig.fa')
-    cmd = ['vsearch', '--fastq_filter', args.FASTQ, '--fastaout', orig_fasta, '--fastq_qmax', '55', '--threads', str(cpus)]
-    amptklib.runSubprocess(cmd, amptklib.log)
-    orig_total = amptklib.countfasta(orig_fasta)
-    size = amptklib.checkfastqsize(args.FASTQ)
-    readablesize = amptklib.convertSize(size)
-    amptklib.log.info('{0:,}'.format(orig_total) + ' reads (' + readablesize + ')')
+    origcmd = ['vsearch', '--fastq_filter', args.FASTQ, '--fastaout', orig_fasta, '--fastq_qmax', '55', '--threads', str(cpus)]
 
     #Expected Errors filtering step
     filter_out = os.path.join(tmp, base + '.EE' + args.maxee + '.filter.fq')
     filter_fasta = os.path.join(tmp, base + '.EE' + args.maxee + '.filter.fa')
+    filtercmd = ['vsearch', '--fastq_filter', args.FASTQ, '--fastq_maxee', str(args.maxee), '--fastaout', filter_fasta, '--fastq_qmax', '55', '--threads', str(cpus)]
+    if args.debug: #filtered FASTQ is not used downstream, only write it if keeping intermediate files
+        filtercmd += ['--fastqout', filter_out]
+    #both steps only read the input FASTQ, so run them at the same time
+    amptklib.runSubprocessParallel([origcmd, filtercmd], amptklib.log)
+    orig_total = amptklib.countfasta(orig_fasta)
+    size = amptklib.checkfastqsize(args.FASTQ)
+    readablesize = amptklib.convertSize(size)
+    amptklib.log.info('{0:,}'.format(orig_total) + ' reads (' + readablesize + ')')
     amptklib.log.info("Quality Filtering, expected errors < %s" % args.maxee)
-    cmd = ['vsearch', '--fastq_filter', args.FASTQ, '--fastq_maxee', str(args.maxee), '--fastqout', filter_out, '--fastaout', filter_fasta, '--fastq_qmax', '55', '--threads', str(cpus)]
-    amptklib.runSubprocess(cmd, amptklib.log)
-    qtrimtotal = amptklib.countfastq(filter_out)
+    qtrimtotal = amptklib.countfasta(filter_fasta)
     amptklib.log.info('{0:,}'.format(qtrimtotal) + ' reads passed')
 
     #now run full length dereplication
     derep_out = os.path.join(tmp, base + '.EE' + args.maxee + '.derep.fa')
     amptklib.log.info("De-replication (remove duplicate reads)")
-    cmd = ['vsearch', '--derep_fulllength', filter_fasta, '--sizeout', '--output', derep_out, '--threads', str(cpus), '--threads', str(cpus)]
+    if amptklib.gvc(amptklib.get_vsearch_version(), '2.20.0'):
+        cmd = ['vsearch', '--fastx_uniques', filter_fasta, '--sizeout', '--fastaout', derep_out]
+    else:
+        cmd = ['vsearch', '--derep_fulllength', filter_fasta, '--sizeout', '--output', derep_out, '--threads', str(cpus)]
     amptklib.runSubprocess(cmd, amptklib.log)
     total = amptklib.countfasta(derep_out)
     amptklib.log.info('{0:,}'.format(total) + ' reads passed')
@@ -322,11 +327,12 @@ def main(args):
     else:
         reads = orig_fasta
     amptklib.log.info("Mapping Reads to OTUs and Building OTU table")
-    cmd = ['vsearch', '--usearch_global', reads, '--strand', 'plus', '--id', '0.97', '--db', otu_clean, '--uc', uc_out, '--otutabout', otu_table, '--threads', str(cpus)]
-    amptklib.runSubprocess(cmd, amptklib.log)
-
-    #count reads mapped
-    total = amptklib.line_count2(uc_out)
+    cmd = ['vsearch', '--usearch_global', reads, '--strand', 'plus', '--id', '0.97', '--db', otu_clean, '--uc', '/dev/stdout', '--otutabout', otu_table, '--threads', str(cpus)]
+    #count reads mapped from the .uc stream, only keep it on disk for --debug
+    if args.debug:
+        total = amptklib.runSubprocessUC(cmd, amptklib.log, uc_out)
+    else:
+        total = amptklib.runSubprocessUC(cmd, amptklib.log)
     amptklib.log.info('{0:,}'.format(total) + ' reads mapped to OTUs '+ '({0:.0f}%)'.format(total/float(orig_total)* 100))
 
     #Move files around, delete tmp if argument passed.
@@ -9,6 +9,7 @@ import multiprocessing
 import time
 import shutil
 import gzip
+import mmap
 import edlib
 import pandas as pd
 import json
@@ -32,6 +33,9 @@ except ImportError:
 
 parentdir = os.path.join(os.path.dirname(__file__))
 
+#128 KB buffer for reading/writing sequence files, keeps up with decompression pipes better than the 8 KB default
+BUFSIZE = 1 << 17
+
 ASCII = {'!':'0','"':'1','#':'2','$':'3','%':'4','&':'5',
          "'":'6','(':'7',')':'8','*':'9','+':'10',',':'11',
          '-':'12','.':'13','/':'14','0':'15','1':'16','2':'17',
@@ -347,7 +351,7 @@ def mod_versions():
 
 class gzopen(object):
     def __init__(self, fname):
-        f = open(fname)
+        f = open(fname, buffering=BUFSIZE)
         # Read magic number (the first 2 bytes) and rewind.
         magic_number = f.read(2)
         f.seek(0)
@@ -441,24 +445,54 @@ def GuessRL(input):
     return myround(max(set(lengths)))
 
 def countfasta(input):
-    count = 0
-    with open(input, 'r') as f:
-        for line in f:
-            if line.startswith(">"):
-                count += 1
+    #memory map the file and count newline+'>' pairs in 1 MB slices, overlap by a byte to catch pairs split across slices
+    with open(input, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return 0
+        m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if hasattr(m, 'madvise'):
+                m.madvise(mmap.MADV_SEQUENTIAL)
+            count = 1 if m[:1] == b'>' else 0
+            for pos in range(0, size, 1048576):
+                count += m[max(pos - 1, 0):pos + 1048576].count(b'\n>')
+        finally:
+            m.close()
     return count
 
+def _countlines(f):
+    #count newlines in 1 MB binary chunks, a missing final newline still counts as a line
+    lines = 0
+    last = b'\n'
+    while True:
+        chunk = f.read(1048576)
+        if not chunk:
+            break
+        lines += chunk.count(b'\n')
+        last = chunk[-1:]
+    if last != b'\n':
+        lines += 1
+    return lines
+
+def countfastqsize(input):
+    #single pass over the binary file, return number of reads and file size
+    size = os.path.getsize(input)
+    with open(input, 'rb', buffering=0) as f:
+        magic_number = f.read(2)
+        f.seek(0)
+        if magic_number == b'\x1f\x8b':
+            f = gzip.GzipFile(fileobj=f)
+        lines = _countlines(f)
+    return lines // 4, size
+
 def countfastq(input):
-    lines = sum(1 for line in gzopen(input))
-    count = int(lines) // 4
+    count, size = countfastqsize(input)
     return count
 
 def line_count(fname):
-    with open(fname) as f:
-        i = -1
-        for i, l in enumerate(f):
-            pass
-    return i + 1
+    with open(fname, 'rb', buffering=0) as f:
+        return _countlines(f)
 
 def softwrap(string, every=80):
     lines = []
@@ -468,9 +502,9 @@ def softwrap(string, every=80):
 
 def line_count2(fname):
     count = 0
-    with open(fname, 'r') as f:
+    with open(fname, 'rb', buffering=BUFSIZE) as f:
         for line in f:
-            if not '*' in line:
+            if not b'*' in line:
                 count += 1
     return count
 
@@ -485,48 +519,92 @@ def getreadlength(input):
 
 def runSubprocess(cmd, logfile):
     logfile.debug(' '.join(cmd))
-    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=False)
     stdout, stderr = proc.communicate()
     if stdout:
         logfile.debug(stdout.decode("utf-8"))
     if stderr:
         logfile.debug(stderr.decode("utf-8"))
+    if proc.returncode != 0:
+        logfile.error("CMD ERROR: %s exited with status %i" % (' '.join(cmd), proc.returncode))
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+def runSubprocessParallel(cmds, logfile):
+    #run independent commands at the same time, return once they have all finished, re-raises the first failure
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=len(cmds)) as executor:
+        jobs = [executor.submit(runSubprocess, cmd, logfile) for cmd in cmds]
+    for job in jobs:
+        job.result()
+
+def runSubprocessUC(cmd, logfile, output=False):
+    #cmd writes --uc to STDOUT, count mapped reads from the stream, only write .uc to output if passed
+    import tempfile
+    logfile.debug(' '.join(cmd))
+    count = 0
+    with tempfile.TemporaryFile() as err:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err, bufsize=BUFSIZE, close_fds=False)
+        if output:
+            with open(output, 'wb', buffering=BUFSIZE) as out:
+                for line in proc.stdout:
+                    out.write(line)
+                    if not b'*' in line:
+                        count += 1
+        else:
+            for line in proc.stdout:
+                if not b'*' in line:
+                    count += 1
+        proc.stdout.close()
+        proc.wait()
+        err.seek(0)
+        stderr = err.read()
+    if stderr:
+        logfile.debug(stderr.decode("utf-8"))
+    if proc.returncode != 0:
+        logfile.error("CMD ERROR: %s exited with status %i" % (' '.join(cmd), proc.returncode))
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+    return count
 
 def runSubprocess2(cmd, logfile, output):
     #function where output of cmd is STDOUT, capture STDERR in logfile
     logfile.debug(' '.join(cmd))
     with open(output, 'w') as out:
-        proc = subprocess.Popen(cmd, stdout=out, stderr=subprocess.PIPE)
+        proc = subprocess.Popen(cmd, stdout=out, stderr=subprocess.PIPE, close_fds=False)
     stderr = proc.communicate()
     if stderr:
         if stderr[0] != None:
             logfile.debug(stderr.decode("utf-8"))
+    if proc.returncode != 0:
+        logfile.error("CMD ERROR: %s exited with status %i, continuing" % (' '.join(cmd), proc.returncode))
 
 def runSubprocess3(cmd, logfile, folder, output):
     #function where output of cmd is STDOUT, capture STDERR in logfile
     logfile.debug(' '.join(cmd))
     with open(output, 'w') as out:
-        proc = subprocess.Popen(cmd, stdout=out, stderr=out, cwd=folder)
+        proc = subprocess.Popen(cmd, stdout=out, stderr=out, cwd=folder, close_fds=False)
     stderr = proc.communicate()
     if stderr:
         if stderr[0] != None:
             logfile.debug(stderr.decode("utf-8"))
+    if proc.returncode != 0:
+        logfile.error("CMD ERROR: %s exited with status %i, continuing" % (' '.join(cmd), proc.returncode))
 
 def runSubprocess4(cmd, logfile, logfile2):
     #function where cmd is issued in logfile, and log captured in logfile 2
     logfile.debug(' '.join(cmd))
     with open(logfile2, 'w') as out:
-        proc = subprocess.Popen(cmd, stdout=out, stderr=out)
+        proc = subprocess.Popen(cmd, stdout=out, stderr=out, close_fds=False)
     stderr = proc.communicate()
     if stderr:
         if stderr[0] != None:
             logfile.debug(stderr.decode("utf-8"))
+    if proc.returncode != 0:
+        logfile.error("CMD ERROR: %s exited with status %i, continuing" % (' '.join(cmd), proc.returncode))
 
 def runSubprocess5(cmd):
-    #function where no logfile and stdout/stderr to fnull
-    FNULL = open(os.devnull, 'w')
+    #function where no logfile and stdout/stderr to devnull, returns exit status
     #print(' '.join(cmd))
-    subprocess.call(cmd, stdout=FNULL, stderr=FNULL)
+    return subprocess.call(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, close_fds=False)
 
 def getSize(filename):
     st = os.stat(filename)
@@ -670,9 +748,9 @@ def split_fasta(input, outputdir, chunks):
     fastapos = []
     position = 0
     numseqs = 0
-    with open(input, 'r') as infile:
+    with open(input, 'rb', buffering=BUFSIZE) as infile:
         for line in infile:
-            if line.startswith('>'):
+            if line.startswith(b'>'):
                 numseqs += 1
                 fastapos.append(position)
             position += 1
@@ -1423,50 +1501,42 @@ def validateorientation(tmp, reads, otus, output):
     cmd = ['vsearch', '--usearch_global', reads, '--db', otus, '--sizein', '--id', '0.97', '--strand', 'plus', '--uc', orientcounts]
     runSubprocess(cmd, log)
     OTUCounts = {}
-    with open(orientcounts, 'r') as countdata:
+    #only the last two .uc columns (query and target labels) are needed, keep them as bytes
+    with open(orientcounts, 'rb', buffering=BUFSIZE) as countdata:
         for line in countdata:
-            line = line.rstrip()
-            cols = line.split('\t')
-            ID = cols[9]
-            if ID == '*':
+            cols = line.rstrip(b'\r\n').rsplit(b'\t', 2)
+            ID = cols[-1]
+            if ID == b'*':
                 continue
-            size = cols[8].split('size=')[-1].replace(';', '')
+            size = int(cols[-2].split(b'size=')[-1].rstrip(b';'))
             if not ID in OTUCounts:
-                OTUCounts[ID] = int(size)
+                OTUCounts[ID] = size
             else:
-                OTUCounts[ID] += int(size)
+                OTUCounts[ID] += size
     orientmap = os.path.join(tmp, 'orient-map.txt')
     cmd = ['vsearch', '--usearch_global', otus, '--db', otus, '--self', '--id', '0.95', '--strand', 'both', '--userout', orientmap, '--userfields', 'query+target+qstrand+id']
     runSubprocess(cmd, log)
-    orient_remove = []
-    keeper = []
-    with open(orientmap, 'r') as selfmap:
+    orient_remove = set()
+    keeper = set()
+    with open(orientmap, 'rb', buffering=BUFSIZE) as selfmap:
         for line in selfmap:
-            line = line.rstrip()
-            cols = line.split('\t')
-            if cols[2] == '-':
+            cols = line.rstrip().split(b'\t')
+            if cols[2] == b'-':
                 qCount = OTUCounts.get(cols[0])
                 if qCount is None:
                     qCount = 0
                 tCount = OTUCounts.get(cols[1])
                 if qCount > tCount:
-                    if not cols[1] in orient_remove and not cols[1] in keeper:
-                        orient_remove.append(cols[1])
-                    if not cols[0] in keeper:
-                        keeper.append(cols[0])
-                else:
-                    if not cols[0] in orient_remove and not cols[0]:
-                        orient_remove.append(cols[0])
                     if not cols[1] in keeper:
-                        keeper.append(cols[1])
-    log.debug('Dropping {:,} OTUs: {:}'.format(len(orient_remove), ', '.join(orient_remove)))
-    count = 0
-    with open(output, 'w') as outfile:
-        with open(otus, 'r') as infile:
-            for rec in SeqIO.parse(infile, 'fasta'):
-                if not rec.id in orient_remove:
-                    count += 1
-                    SeqIO.write(rec, outfile, 'fasta')
+                        orient_remove.add(cols[1])
+                    keeper.add(cols[0])
+                else:
+                    if not cols[0]:
+                        orient_remove.add(cols[0])
+                    keeper.add(cols[1])
+    orient_remove = set(x.decode('utf-8') for x in orient_remove)
+    log.debug('Dropping {:,} OTUs: {:}'.format(len(orient_remove), ', '.join(natsorted(orient_remove))))
+    count = fastaremove(otus, orient_remove, output)
     return count, len(orient_remove)
 
 
@@ -1474,8 +1544,8 @@ def validateorientationDADA2(OTUCounts, otus, output):
     orientmap = 'orient-map.txt'
     cmd = ['vsearch', '--usearch_global', otus, '--db', otus, '--self', '--id', '0.95', '--strand', 'both', '--userout', orientmap, '--userfields', 'query+target+qstrand+id']
     runSubprocess(cmd, log)
-    orient_remove = []
-    keeper = []
+    orient_remove = set()
+    keeper = set()
     with open(orientmap, 'r') as selfmap:
         for line in selfmap:
             line = line.rstrip()
@@ -1484,23 +1554,15 @@ def validateorientationDADA2(OTUCounts, otus, output):
                 qCount = OTUCounts.get(cols[0])
                 tCount = OTUCounts.get(cols[1])
                 if qCount > tCount:
-                    if not cols[1] in orient_remove and not cols[1] in keeper:
-                        orient_remove.append(cols[1])
-                    if not cols[0] in keeper:
-                        keeper.append(cols[0])
-                else:
-                    if not cols[0] in orient_remove and not cols[0]:
-                        orient_remove.append(cols[0])
                     if not cols[1] in keeper:
-                        keeper.append(cols[1])
+                        orient_remove.add(cols[1])
+                    keeper.add(cols[0])
+                else:
+                    if not cols[0]:
+                        orient_remove.add(cols[0])
+                    keeper.add(cols[1])
     log.debug('Dropping {:,} OTUs: {:}'.format(len(orient_remove), ', '.join(natsorted(orient_remove))))
-    count = 0
-    with open(output, 'w') as outfile:
-        with open(otus, 'r') as infile:
-            for rec in SeqIO.parse(infile, 'fasta'):
-                if not rec.id in orient_remove:
-                    count += 1
-                    SeqIO.write(rec, outfile, 'fasta')
+    count = fastaremove(otus, orient_remove, output)
     SafeRemove(orientmap)
     return count, len(orient_remove)
 
@@ -1863,22 +1925,31 @@ def MaxEEFilter(input, maxee):
                 yield rec
 
 def dereplicate(input, output):
-    from Bio.SeqIO.QualityIO import FastqGeneralIterator
+    #read FASTQ as raw 4 line records in binary, only header and sequence are needed
     seqs = {}
-    with open(input, 'r') as file:
-        for title, sequence, qual in FastqGeneralIterator(file):
-            if sequence not in seqs:
-                if title.endswith(';'):
-                    seqs[sequence]=title+'size=1;'
-                else:
-                    seqs[sequence]=title+';size=1;'
+    with open(input, 'rb', buffering=BUFSIZE) as file:
+        while True:
+            header = file.readline()
+            if not header:
+                break
+            sequence = file.readline().rstrip(b'\r\n')
+            file.readline()
+            file.readline()
+            hit = seqs.get(sequence)
+            if hit is None:
+                seqs[sequence] = [header[1:].rstrip(b'\r\n').rstrip(b';'), 1]
             else:
-                count = int(seqs[sequence].split('=')[-1].rstrip(';')) + 1
-                formated_string = seqs[sequence].rsplit('=', 1)[0]+'='+str(count)+';'
-                seqs[sequence] = formated_string
-    with open(output, 'w') as out:
-        for sequence in seqs:
-            out.write('>'+seqs[sequence]+'\n'+sequence+'\n')
+                hit[1] += 1
+    #write in batches of records to cut down on the number of write calls
+    with open(output, 'wb', buffering=1048576) as out:
+        batch = []
+        for sequence, (title, count) in seqs.items():
+            batch.append(b'>%b;size=%d;\n%b\n' % (title, count, sequence))
+            if len(batch) == 4096:
+                out.writelines(batch)
+                batch = []
+        if batch:
+            out.writelines(batch)
 
 def convertSize(num, suffix='B'):
     for unit in ['','K','M','G','T','P','E','Z']:
@@ -1937,6 +2008,54 @@ def CheckDependencies(input):
         log.error("Missing Dependencies: %s.  Please install missing dependencies and re-run script" % (error))
         sys.exit(1)
 
+def fastaremove(input, remove, output):
+    #drop records by ID, only header lines are parsed and runs of kept records are copied by the kernel
+    if len(remove) == 0:
+        shutil.copyfile(input, output)
+        return countfasta(output)
+    remove = set(remove)
+    count = 0
+    with open(input, 'rb') as infile:
+        with open(output, 'wb') as outfile:
+            size = os.fstat(infile.fileno()).st_size
+            if size == 0:
+                return 0
+            #sendfile writes to the fd directly, once it fails stay on the buffered writer so records remain in order
+            use_sendfile = [hasattr(os, 'sendfile')]
+            def _copy(start, end):
+                while start < end and use_sendfile[0]:
+                    try:
+                        sent = os.sendfile(outfile.fileno(), infile.fileno(), start, end - start)
+                    except OSError:
+                        sent = 0
+                    if sent == 0:
+                        use_sendfile[0] = False
+                        break
+                    start += sent
+                if start < end:
+                    outfile.write(m[start:end])
+            m = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                runstart = 0
+                pos = m.find(b'>')
+                while pos != -1:
+                    eol = m.find(b'\n', pos)
+                    if eol == -1:
+                        eol = size
+                    title = m[pos+1:eol].split(None, 1)
+                    ID = title[0].decode('utf-8') if title else ''
+                    nextrec = m.find(b'\n>', eol)
+                    if ID in remove:
+                        _copy(runstart, pos)
+                        runstart = size if nextrec == -1 else nextrec + 1
+                    else:
+                        count += 1
+                    pos = -1 if nextrec == -1 else nextrec + 1
+                _copy(runstart, size)
+            finally:
+                m.close()
+    return count
+
 def fastarename(input, relabel, output):
     from Bio.SeqIO.FastaIO import FastaIterator
     with open(output, 'w') as outfile:
@@ -1947,13 +2066,29 @@ def fastarename(input, relabel, output):
             counter += 1
 
 def fasta_strip_padding(file, output, stripsize=False):
-    from Bio.SeqIO.FastaIO import FastaIterator
-    with open(output, 'w') as outputfile:
-        for record in FastaIterator(gzopen(file)):
-            Seq = record.seq.rstrip('N')
-            if ';size=' in record.id:
-                record.id = record.id.split(';size=')[0]
-            outputfile.write(">%s\n%s\n" % (record.id, Seq))
+    #binary pass, whitespace removed from sequence lines with a translate table, then trailing N padding stripped
+    def _write(outputfile, ID, seqlines):
+        Seq = b''.join(seqlines).rstrip(b'N')
+        outputfile.write(b'>'+ID+b'\n'+Seq+b'\n')
+    with open(output, 'wb', buffering=BUFSIZE) as outputfile:
+        with open(file, 'rb', buffering=BUFSIZE) as infile:
+            if infile.peek(2)[:2] == b'\x1f\x8b':
+                infile = gzip.GzipFile(fileobj=infile)
+            ID = None
+            seqlines = []
+            for line in infile:
+                if line.startswith(b'>'):
+                    if ID is not None:
+                        _write(outputfile, ID, seqlines)
+                    title = line[1:].split(None, 1)
+                    ID = title[0] if title else b''
+                    if b';size=' in ID:
+                        ID = ID.split(b';size=')[0]
+                    seqlines = []
+                else:
+                    seqlines.append(line.translate(None, b' \t\r\n'))
+            if ID is not None:
+                _write(outputfile, ID, seqlines)
 
 def fastq_strip_padding(file, output):
     from Bio.SeqIO.QualityIO import FastqGeneralIterator
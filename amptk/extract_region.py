@@ -45,6 +45,11 @@ u"ö": u"o", u"÷": u"/", u"ø": u"o", u"ù": u"u", u"ú": u"u",
 u"û": u"u", u"ü": u"u", u"ý": u"y", u"þ": u"p", u"ÿ": u"y",
 u"’": u"'", u"×": u"x"}
 
+#compile once, these are applied to every record when reformatting taxonomy
+paren_suffix = re.compile('[(].*$')
+empty_species = re.compile(',s:$')
+empty_species_eq = re.compile('=s:$')
+
 
 def latin2ascii(error):
     return latin_dict[error.object[error.start]], error.start+1
@@ -111,25 +116,25 @@ def uniteTax(taxString):
     if not gbID:
        return None
     if tax:
-        taxonomy = re.sub(";", ",", tax)
-        taxonomy = re.sub("__", ":", taxonomy)
+        taxonomy = tax.replace(";", ",")
+        taxonomy = taxonomy.replace("__", ":")
         tf = taxonomy.split(",")
         k = tf[0]
-        k = re.sub('_', ' ', k)
+        k = k.replace('_', ' ')
         p = tf[1]
-        p = re.sub('_', ' ', p)
+        p = p.replace('_', ' ')
         c = tf[2]
-        c = re.sub('_', ' ', c)
+        c = c.replace('_', ' ')
         o = tf[3]
-        o = re.sub('_', ' ', o)
+        o = o.replace('_', ' ')
         f = tf[4]
-        f = re.sub('_', ' ', f)
+        f = f.replace('_', ' ')
         g = tf[5]
-        g = re.sub('_', ' ', g)
+        g = g.replace('_', ' ')
         s = tf[6]
-        s = re.sub('[(].*$','',s)
-        s = re.sub('_', ' ', s)
-        s = re.sub('\.', '', s)
+        s = paren_suffix.sub('', s)
+        s = s.replace('_', ' ')
+        s = s.replace('.', '')
         test_species = s.split(' ')
         if len(test_species) < 2:
             s = 's:'
@@ -151,8 +156,8 @@ def uniteTax(taxString):
         if not any(x in s for x in sp_removal):
             reformat_tax.append(s)
         taxReformatString = gbID+'|'+unite+";tax="+",".join(reformat_tax)
-        taxReformatString = re.sub(",s:$", "", taxReformatString)
-        taxReformatString = re.sub("=s:$", "=", taxReformatString)
+        taxReformatString = empty_species.sub("", taxReformatString)
+        taxReformatString = empty_species_eq.sub("=", taxReformatString)
         taxReformatString = taxReformatString.strip()
         return taxReformatString
     else:
@@ -208,9 +213,9 @@ def rdpTax(taxString):
     split_temp = temp[0].split(";")
     ID = split_temp[0].split(" ")[0]
     s = "s:" + split_temp[0].split(" ", 1)[-1]
-    s = re.sub('[(].*$','',s)
-    s = re.sub(',', '_', s)
-    s = re.sub('\.', '', s)
+    s = paren_suffix.sub('', s)
+    s = s.replace(',', '_')
+    s = s.replace('.', '')
     test_species = s.split(' ')
     if len(test_species) < 2:
         s = 's:'
@@ -284,7 +289,7 @@ def rdpTax(taxString):
             s = s.replace(" I", "")
         reformat_tax.append(s)
     taxReformatString = ID+";tax="+",".join(reformat_tax)
-    taxReformatString = re.sub(",s:$", "", taxReformatString)
+    taxReformatString = empty_species.sub("", taxReformatString)
     taxReformatString = taxReformatString.strip()
     return taxReformatString
 
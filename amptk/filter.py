@@ -85,11 +85,6 @@ def main(args):
     if check == 0:
         lib.log.error("Input OTU table is empty")
         sys.exit(1)
-    #get the OTU header info (depending on how OTU table was constructed, this might be different, so find it as you need for indexing)
-    with open(args.otu_table, 'r') as f:
-        first_line = f.readline()
-        OTUhead = first_line.split('\t')[0]
-
     if args.delimiter == 'csv':
         delim = str(',')
         ending = '.csv'
@@ -107,9 +102,10 @@ def main(args):
     final_binary_table = base+'.final.binary'+ending
     stats_table = base+'.stats'+ending
 
-    #load OTU table into pandas DataFrame
-    df = pd.read_csv(args.otu_table, sep='\t')
-    df.set_index(OTUhead, inplace=True)
+    #load OTU table into pandas DataFrame, single pass over the file
+    #the OTU header depends on how the OTU table was constructed, so take it from the index column
+    df = pd.read_csv(args.otu_table, sep='\t', index_col=0)
+    OTUhead = df.index.name
     headers = df.columns.values.tolist()
     if headers[-1] == 'taxonomy' or headers[-1] == 'Taxonomy':
         otuDict = df[headers[-1]].to_dict()
@@ -126,24 +122,26 @@ def main(args):
     #now add counts to fasta header
     FastaCounts = base+'.otus.counts.fa'
     OTU_tax = {}
-    with open(FastaCounts, 'w') as outfile:
-        with open(args.fasta, 'r') as infile:
-            for rec in SeqIO.parse(infile, 'fasta'):
-                if ';' in rec.id: #this should mean there is taxonomy, so split it
-                    ID = rec.id.split(';',1)[0]
-                    tax = rec.id.split(';',1)[-1]
+    #single binary pass, only header lines are rewritten, sequence lines are copied as is
+    with open(FastaCounts, 'wb', buffering=lib.BUFSIZE) as outfile:
+        with open(args.fasta, 'rb', buffering=lib.BUFSIZE) as infile:
+            for line in infile:
+                if not line.startswith(b'>'):
+                    if not line.endswith(b'\n'):
+                        line += b'\n'
+                    outfile.write(line)
+                    continue
+                recID = line[1:].split(None, 1)[0].decode('utf-8')
+                if ';' in recID: #this should mean there is taxonomy, so split it
+                    ID, tax = recID.split(';', 1)
                     OTU_tax[ID] = tax
-                    if ID in AddCounts:
-                        count = AddCounts.get(ID)
-                    else:
-                        count = 0
-                    outfile.write('>%s;size=%i\n%s\n' % (ID, count, rec.seq))
                 else: #no tax, just process
-                    if rec.id in AddCounts:
-                        count = AddCounts.get(rec.id)
-                    else:
-                        count = 0
-                    outfile.write('>%s;size=%i\n%s\n' % (rec.id, count, rec.seq))
+                    ID = recID
+                if ID in AddCounts:
+                    count = AddCounts.get(ID)
+                else:
+                    count = 0
+                outfile.write(('>%s;size=%i\n' % (ID, count)).encode('utf-8'))
 
     lib.log.info('OTU table contains {:,} samples, {:,} OTUs, and {:,} reads counts'.format(len(df.columns.values.tolist()), len(df.index), int(df.values.sum())))
 
@@ -186,7 +184,7 @@ def main(args):
         lib.log.info("Mapping OTUs to Mock Community (USEARCH)")
         cmd = ['vsearch', '-usearch_global', mockFile, '--strand', 'plus',
                '--id', '0.65','--db', FastaCounts, '--userout', mock_out,
-               '--userfields', 'query+target+id+ql+tl+alnlen+caln+mism+gaps',
+               '--userfields', 'query+target+id+ql+tl+alnlen+mism+gaps',
                '--maxaccepts', '0', '--maxrejects', '0']
         lib.runSubprocess(cmd, lib.log)
 
@@ -198,18 +196,17 @@ def main(args):
         '''
         Results = {}
         errorrate = {}
-        with open(mock_out, 'r') as map:
+        with open(mock_out, 'rb', buffering=lib.BUFSIZE) as map:
             for line in map:
-                line = line.replace('\n', '')
-                cols = line.split('\t')
-                MockID = cols[0]
-                hit = cols[1].split(';size=')
-                otuID = hit[0]
+                cols = line.rstrip(b'\n').split(b'\t')
+                MockID = cols[0].decode('utf-8')
+                hit = cols[1].split(b';size=')
+                otuID = hit[0].decode('utf-8')
                 abundance = int(hit[1])
                 pident = float(cols[2])
                 length = int(cols[4])
-                mism = int(cols[7])
-                gaps = int(cols[8])
+                mism = int(cols[6])
+                gaps = int(cols[7])
                 diffs = gaps + mism
                 score = abundance * pident * length
                 if not otuID in errorrate:
@@ -248,13 +245,12 @@ def main(args):
 
         #make name change dict
         annotate_dict = {}
-        seen = []
+        seen = set()
         for k,v in natsorted(list(found_dict.items())):
             ID = v[0].replace('_chimera', '')
             newID = k+'_pident='+str(v[2])+'_'+v[0]
             annotate_dict[ID] = newID
-            if not v[0] in seen:
-                seen.append(v[0])
+            seen.add(v[0])
         if args.calculate == 'all':
             chimeras = [x for x in chimeras if x not in seen]
             variants = [x for x in variants if x not in seen]
@@ -336,8 +332,9 @@ def main(args):
         for k,v in list(annotate_dict.items()):
             if not '_suspect_mock_' in v:
                 mock.append(v)
+        mock_set = set(mock)
         for i in norm_round.index:
-            if not i in mock:
+            if not i in mock_set:
                 sample.append(i)
         if args.ignore:
             mock = [x for x in mock if x not in args.ignore]
@@ -491,29 +488,17 @@ def main(args):
     if args.mock_barcode:
         mocks = final[args.mock_barcode]
         mocks = mocks.loc[~(mocks==0)].astype(int)
-        totalmismatches = 0
-        totallength = 0
-        chimera_count = 0
-        variant_count = 0
-        for otu in mocks.index:
-            count = mocks[otu]
-            if 'suspect_mock' in otu:
-                if 'chimera' in otu:
-                    chimera_count += 1
-                if 'variant' in otu:
-                    variant_count += 1
-                otu = otu.split('_',1)[0]
-            else:
-                otu = otu.split('_',-1)[-1]
-            otu_length = SeqLength.get(otu)
-            countlen = otu_length * count
-            totallength += countlen
-            if otu in errorrate:
-                otu_diffs = errorrate.get(otu)[1]
-                totaldiffs = otu_diffs * count
-                totalmismatches += totaldiffs
-            else:
-                totalmismatches += countlen
+        suspect = mocks.index.str.contains('suspect_mock')
+        chimera_count = int((suspect & mocks.index.str.contains('chimera')).sum())
+        variant_count = int((suspect & mocks.index.str.contains('variant')).sum())
+        #get original OTU names back, then per OTU length and differences to mock as int64 arrays
+        otus = [otu.split('_',1)[0] if 'suspect_mock' in otu else otu.split('_',-1)[-1] for otu in mocks.index]
+        lengths = np.fromiter((SeqLength.get(otu) for otu in otus), dtype=np.int64, count=len(otus))
+        #OTUs that did not map to the mock count every base as a mismatch
+        diffs = np.fromiter((errorrate.get(otu)[1] if otu in errorrate else SeqLength.get(otu) for otu in otus), dtype=np.int64, count=len(otus))
+        counts = mocks.values.astype(np.int64)
+        totallength = int(np.dot(lengths, counts))
+        totalmismatches = int(np.dot(diffs, counts))
         e_rate = totalmismatches / float(totallength) * 100
         lib.log.info(args.mock_barcode + ' sample has '+'{0:,}'.format(len(mocks))+' OTUS out of '+'{0:,}'.format(mock_ref_count)+ ' expected; '+'{0:,}'.format(variant_count)+ ' mock variants; '+ '{0:,}'.format(chimera_count)+ ' mock chimeras; Error rate: '+'{0:.3f}%'.format(e_rate))
 
@@ -654,20 +639,23 @@ def main(args):
         #generate final OTU list for taxonomy
         lib.log.info("Finding valid OTUs")
         otu_new = base + '.filtered.otus.fa'
+        #hash the table index once, membership tests on the pandas Index are slow per record
+        keepers = set(final3.index)
         with open(otu_new, 'w') as otu_update:
             with open(args.fasta, "r") as myfasta:
                 for rec in SeqIO.parse(myfasta, 'fasta'):
                     if ';' in rec.id:
                         rec.id = rec.id.split(';',1)[0]
                     if args.mock_barcode:
-                        #map new names of mock
-                        if rec.id in annotate_dict:
-                            newname = annotate_dict.get(rec.id)
+                        #map new names of mock, single lookup per record
+                        newname = annotate_dict.get(rec.id)
+                        if newname is not None:
                             rec.id = newname
                             rec.description = ''
-                    if rec.id in final3.index:
-                        if rec.id in OTU_tax:
-                            otu_update.write('>%s;%s\n%s\n' % (rec.id, OTU_tax.get(rec.id), rec.seq))
+                    if rec.id in keepers:
+                        tax = OTU_tax.get(rec.id)
+                        if tax is not None:
+                            otu_update.write('>%s;%s\n%s\n' % (rec.id, tax, rec.seq))
                         else:
                             otu_update.write('>%s\n%s\n' % (rec.id, rec.seq))
 
@@ -251,8 +251,7 @@ def main(args):
 
     #Count FASTQ records
     amptklib.log.info("Loading FASTQ Records")
-    orig_total = amptklib.countfastq(args.fastq)
-    size = amptklib.checkfastqsize(args.fastq)
+    orig_total, size = amptklib.countfastqsize(args.fastq)
     readablesize = amptklib.convertSize(size*2)
     amptklib.log.info('{:,} reads ({:})'.format(orig_total, readablesize))
 
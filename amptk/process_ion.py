@@ -320,8 +320,7 @@ def main(args):
 
     #Count FASTQ records
     amptklib.log.info("Loading FASTQ Records")
-    orig_total = amptklib.countfastq(SeqIn)
-    size = amptklib.checkfastqsize(SeqIn)
+    orig_total, size = amptklib.countfastqsize(SeqIn)
     readablesize = amptklib.convertSize(size)
     amptklib.log.info('{0:,}'.format(orig_total) + ' reads (' + readablesize + ')')
 
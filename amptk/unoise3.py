@@ -113,7 +113,7 @@ def main(args):
     amptklib.log.info("Loading FASTQ Records")
     # convert to FASTA for mapping
     orig_fasta = os.path.join(tmp, base + ".orig.fa")
-    cmd = [
+    origcmd = [
         "vsearch",
         "--fastq_filter",
         args.FASTQ,
@@ -124,24 +124,16 @@ def main(args):
         "--threads",
         str(cpus),
     ]
-    amptklib.runSubprocess(cmd, amptklib.log)
-    orig_total = amptklib.countfasta(orig_fasta)
-    size = amptklib.checkfastqsize(args.FASTQ)
-    readablesize = amptklib.convertSize(size)
-    amptklib.log.info("{0:,}".format(orig_total) + " reads (" + readablesize + ")")
 
     # Expected Errors filtering step
     filter_out = os.path.join(tmp, base + ".EE" + args.maxee + ".filter.fq")
     filter_fasta = os.path.join(tmp, base + ".EE" + args.maxee + ".filter.fa")
-    amptklib.log.info("Quality Filtering, expected errors < %s" % args.maxee)
-    cmd = [
+    filtercmd = [
         "vsearch",
         "--fastq_filter",
         args.FASTQ,
         "--fastq_maxee",
         str(args.maxee),
-        "--fastqout",
-        filter_out,
         "--fastaout",
         filter_fasta,
         "--fastq_qmax",
@@ -149,8 +141,17 @@ def main(args):
         "--threads",
         str(cpus),
     ]
-    amptklib.runSubprocess(cmd, amptklib.log)
-    total = amptklib.countfastq(filter_out)
+    if args.debug:
+        # dereplication runs from the FASTA, only write filtered FASTQ if keeping intermediate files
+        filtercmd += ["--fastqout", filter_out]
+    # both steps only read the input FASTQ, so run them at the same time
+    amptklib.runSubprocessParallel([origcmd, filtercmd], amptklib.log)
+    orig_total = amptklib.countfasta(orig_fasta)
+    size = amptklib.checkfastqsize(args.FASTQ)
+    readablesize = amptklib.convertSize(size)
+    amptklib.log.info("{0:,}".format(orig_total) + " reads (" + readablesize + ")")
+    amptklib.log.info("Quality Filtering, expected errors < %s" % args.maxee)
+    total = amptklib.countfasta(filter_fasta)
     amptklib.log.info("{0:,}".format(total) + " reads passed")
 
     # now run full length dereplication
@@ -160,7 +161,7 @@ def main(args):
         cmd = [
             "vsearch",
             "--fastx_uniques",
-            filter_out,
+            filter_fasta,
             "--relabel",
             "Read_",
             "--sizeout",
@@ -171,7 +172,7 @@ def main(args):
         cmd = [
             "vsearch",
             "--derep_fulllength",
-            filter_out,
+            filter_fasta,
             "--relabel",
             "Read_",
             "--sizeout",
@@ -338,16 +339,17 @@ def main(args):
         "--db",
         passingOTUs,
         "--uc",
-        uc_iSeq_out,
+        "/dev/stdout",
         "--otutabout",
         iSeq_otu_table,
         "--threads",
         str(cpus),
     ]
-    amptklib.runSubprocess(cmd, amptklib.log)
-
-    # count reads mapped
-    total = amptklib.line_count2(uc_iSeq_out)
+    # count reads mapped from the .uc stream, only keep it on disk for --debug
+    if args.debug:
+        total = amptklib.runSubprocessUC(cmd, amptklib.log, uc_iSeq_out)
+    else:
+        total = amptklib.runSubprocessUC(cmd, amptklib.log)
     amptklib.log.info(
         "{0:,}".format(total)
         + " reads mapped to ASVs "
@@ -437,16 +439,17 @@ def main(args):
         "--db",
         uclust_out,
         "--uc",
-        uc_out,
+        "/dev/stdout",
         "--otutabout",
         otu_table,
         "--threads",
         str(cpus),
     ]
-    amptklib.runSubprocess(cmd, amptklib.log)
-
-    # count reads mapped
-    total = amptklib.line_count2(uc_out)
+    # count reads mapped from the .uc stream, only keep it on disk for --debug
+    if args.debug:
+        total = amptklib.runSubprocessUC(cmd, amptklib.log, uc_out)
+    else:
+        total = amptklib.runSubprocessUC(cmd, amptklib.log)
     amptklib.log.info(
         "{0:,}".format(total)
         + " reads mapped to OTUs "